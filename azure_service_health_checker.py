@@ -18,30 +18,266 @@ Features:
 - No direct network access required to VMs
 """
 
+import argparse
+import asyncio
+import functools
 import json
 import sys
 import time
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Dict, Optional
 
 try:
     from azure.identity import DefaultAzureCredential
     from azure.mgmt.compute import ComputeManagementClient
+    from azure.mgmt.compute.aio import ComputeManagementClient as AsyncComputeManagementClient
     from azure.mgmt.resource import ResourceManagementClient
+    from azure.mgmt.resourcegraph import ResourceGraphClient
+    from azure.mgmt.resourcegraph.models import QueryRequest, QueryRequestOptions
     from azure.core.exceptions import AzureError
+    from azure.core.pipeline.transport import AioHttpTransport, RequestsTransport
+    import aiohttp
+    import requests
+    from requests.adapters import HTTPAdapter
 except ImportError:
     print("❌ Required Azure libraries not found!")
-    print("Install with: pip install azure-identity azure-mgmt-compute azure-mgmt-resource")
+    print("Install with: pip install azure-identity azure-mgmt-compute azure-mgmt-resource azure-mgmt-resourcegraph aiohttp")
     sys.exit(1)
 
+# orjson parses Run Command output considerably faster when it is available;
+# its JSONDecodeError subclasses json.JSONDecodeError so error handling is unchanged
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+# Tags a VM must carry to be treated as a CLPE VM
+CLPE_REQUIRED_TAGS = {
+    'System': 'CENTRAL_LOYALTY_PROMOTIONS_ENGINE',
+    'ARIS': 'CLPE',
+}
+
+# Resource Graph query selecting CLPE WEB Windows VMs
+CLPE_WEB_VM_QUERY = """
+Resources
+| where type =~ 'microsoft.compute/virtualmachines'
+| where {tag_filter}
+| where tags.Name contains 'WEB'
+| where properties.storageProfile.osDisk.osType =~ 'Windows'
+| project name,
+          resourceGroup = tostring(split(id, '/')[4]),
+          location,
+          vmSize = tostring(properties.hardwareProfile.vmSize),
+          tags,
+          powerState = tostring(properties.extended.instanceView.powerState.code)
+""".format(tag_filter=' and '.join(f"tags.{key} == '{value}'" for key, value in CLPE_REQUIRED_TAGS.items()))
+
+# Connections kept open per host by the sync and async transports; at least as
+# large as the power-state thread pool
+HTTP_POOL_SIZE = 20
+
+# Seconds between Run Command status polls; the SDK default waits far longer
+# than the health-check script usually takes to finish
+RUN_COMMAND_POLLING_INTERVAL = 3
+
+# azure-core's RetryPolicy retries throttled (429/503) and failed requests with
+# exponential backoff, honouring Retry-After; these tune it for every client
+AZURE_RETRY_OPTIONS = {
+    'retry_total': 5,
+    'retry_backoff_factor': 1.0,
+}
+
+# A cached token is renewed once it is this close to expiring
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+# PowerShell script run on the VM; takes the service names as a comma-separated parameter.
+# It is sent byte-for-byte unchanged on every call, with `param` as its first statement.
+SERVICE_HEALTH_SCRIPT = """param([string]$Services)
+
+$serviceList = $Services -split ','
+
+# Query the service controller, WMI and the process table once for all services
+$serviceErrors = @()
+$servicesByName = @{}
+foreach ($service in (Get-Service -Name $serviceList -ErrorAction SilentlyContinue -ErrorVariable serviceErrors)) {
+    $servicesByName[$service.Name] = $service
+}
+
+$errorsByName = @{}
+foreach ($serviceError in $serviceErrors) {
+    $errorsByName[[string]$serviceError.TargetObject] = $serviceError.Exception.Message
+}
+
+$processIdsByName = @{}
+$processesById = @{}
+$processLookupFailed = $false
+$ownProcessServices = @($servicesByName.Values | Where-Object { $_.Status -eq 'Running' -and $_.ServiceType -ne 'Win32ShareProcess' })
+if ($ownProcessServices.Count -gt 0) {
+    try {
+        $filter = ($ownProcessServices | ForEach-Object { "Name='$($_.Name)'" }) -join ' OR '
+        foreach ($cimService in (Get-CimInstance -ClassName Win32_Service -Filter $filter -Property Name, ProcessId)) {
+            $processIdsByName[$cimService.Name] = [int]$cimService.ProcessId
+        }
+        $processIds = @($processIdsByName.Values | Where-Object { $_ -gt 0 })
+        if ($processIds.Count -gt 0) {
+            foreach ($process in (Get-Process -Id $processIds -ErrorAction SilentlyContinue)) {
+                $processesById[[int]$process.Id] = $process
+            }
+        }
+    } catch {
+        $processLookupFailed = $true
+    }
+}
+
+$results = @(foreach ($serviceName in $serviceList) {
+    $service = $servicesByName[$serviceName]
+    if (-not $service) {
+        $errorMessage = $errorsByName[$serviceName]
+        if (-not $errorMessage) {
+            $errorMessage = "Cannot find any service with service name '$serviceName'."
+        }
+        [PSCustomObject]@{
+            ServiceName = $serviceName
+            Status = "NotFound"
+            StartType = "Unknown"
+            ProcessInfo = ""
+            Error = $errorMessage
+        }
+        continue
+    }
+    
+    $processInfo = ""
+    if ($service.Status -eq 'Running' -and $service.ServiceType -ne 'Win32ShareProcess') {
+        if ($processLookupFailed) {
+            $processInfo = "Process info unavailable"
+        } else {
+            $process = $processesById[$processIdsByName[$service.Name]]
+            if ($process) {
+                $processInfo = "PID: $($process.Id), CPU: $([math]::Round($process.CPU, 2))s, Memory: $([math]::Round($process.WorkingSet64/1MB, 2))MB"
+            }
+        }
+    }
+    
+    [PSCustomObject]@{
+        ServiceName = $serviceName
+        Status = $service.Status
+        StartType = $service.StartType
+        ProcessInfo = $processInfo
+        Error = $null
+    }
+})
+
+$results | ConvertTo-Json -Depth 3
+"""
+
+
+class CachedTokenCredential:
+    """Credential wrapper that shares one token per scope between all clients."""
+
+    def __init__(self, credential):
+        self._credential = credential
+        self._tokens = {}
+
+    def get_token(self, *scopes, **kwargs):
+        # A claims challenge means the cached token was rejected
+        if kwargs.get('claims'):
+            return self._credential.get_token(*scopes, **kwargs)
+        key = (scopes, tuple(sorted(kwargs.items())))
+        token = self._tokens.get(key)
+        if token is None or token.expires_on - TOKEN_REFRESH_MARGIN_SECONDS < time.time():
+            token = self._credential.get_token(*scopes, **kwargs)
+            self._tokens[key] = token
+        return token
+
+
+class AsyncCachedTokenCredential:
+    """Async credential backed by a CachedTokenCredential, for the aio compute client."""
+
+    def __init__(self, credential: CachedTokenCredential):
+        self._credential = credential
+
+    async def get_token(self, *scopes, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, functools.partial(self._credential.get_token, *scopes, **kwargs))
+
+    async def close(self):
+        pass
+
 
 class AzureCLPEServiceHealthChecker:
     def __init__(self):
         """Initialize the Azure CLPE WEB Service Health Checker."""
         # Integration Testing subscription ID - hardcoded for security
         self.subscription_id = "5b479b96-2b99-464d-a824-2761380620ea"
-        self.credential = DefaultAzureCredential()
-        self.compute_client = ComputeManagementClient(self.credential, self.subscription_id)
-        self.resource_client = ResourceManagementClient(self.credential, self.subscription_id)
+        # Wrapped so the async client in check_many reuses the sync clients' token
+        self.credential = CachedTokenCredential(DefaultAzureCredential())
+        
+        # Share one pooled HTTP session between all management clients so
+        # concurrent requests reuse TCP/TLS connections
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount('https://', adapter)
+        self.transport = RequestsTransport(session=session, session_owner=False)
+        
+        self.compute_client = ComputeManagementClient(
+            self.credential, self.subscription_id, transport=self.transport, **AZURE_RETRY_OPTIONS
+        )
+        self.resource_client = ResourceManagementClient(
+            self.credential, self.subscription_id, transport=self.transport, **AZURE_RETRY_OPTIONS
+        )
+        self.resource_graph_client = ResourceGraphClient(
+            self.credential, transport=self.transport, **AZURE_RETRY_OPTIONS
+        )
+        self.max_workers = 10
+
+    def _get_power_state(self, resource_group: str, vm_name: str) -> str:
+        """Get the power state of a VM from its instance view, or 'unknown' if it reports none."""
+        instance_view = self.compute_client.virtual_machines.instance_view(resource_group, vm_name)
+        for status in instance_view.statuses:
+            if status.code.startswith('PowerState/'):
+                return status.code.split('/')[-1]
+        return 'unknown'
+
+    def _fill_unknown_power_states(self, vms: List[Dict]):
+        """Look up the power state of every VM still marked 'unknown' from its instance view."""
+        missing = [vm for vm in vms if vm['power_state'] == 'unknown']
+        if not missing:
+            return
+        
+        power_state_warnings = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._get_power_state, vm['resource_group'], vm['name']): vm
+                for vm in missing
+            }
+            for future in as_completed(futures):
+                vm = futures[future]
+                try:
+                    vm['power_state'] = future.result()
+                except Exception as e:
+                    # Reported after the lookups finish so the loop does no console I/O
+                    power_state_warnings.append(f"⚠️  Could not get power state for {vm['name']}: {e}")
+        
+        for warning in power_state_warnings:
+            print(warning)
+
+    def _iter_clpe_web_vm_rows(self) -> Iterator[Dict]:
+        """Yield CLPE WEB VM rows from Resource Graph, one result page at a time."""
+        # Resource Graph applies the tag/OS filters server-side, so only matching
+        # VMs are paged back instead of every VM in the subscription
+        skip_token = None
+        while True:
+            response = self.resource_graph_client.resources(
+                QueryRequest(
+                    subscriptions=[self.subscription_id],
+                    query=CLPE_WEB_VM_QUERY,
+                    options=QueryRequestOptions(skip_token=skip_token)
+                )
+            )
+            yield from response.data
+            skip_token = response.skip_token
+            if not skip_token:
+                return
 
     def get_clpe_web_vms(self) -> List[Dict]:
         """Get CLPE WEB Windows VMs with specific tags in the integration subscription."""
@@ -55,62 +291,25 @@ class AzureCLPEServiceHealthChecker:
         print()
         
         vms = []
-        total_vms = 0
-        filtered_vms = 0
+        vms_append = vms.append
         
         try:
-            for vm in self.compute_client.virtual_machines.list_all():
-                total_vms += 1
-                
-                # Check if it's a Windows VM
-                if not (vm.storage_profile and vm.storage_profile.os_disk and 
-                       vm.storage_profile.os_disk.os_type and
-                       vm.storage_profile.os_disk.os_type.name.lower() == 'windows'):
-                    continue
-                
-                # Check required tags
-                if not vm.tags:
-                    continue
-                
-                # Check System tag
-                if vm.tags.get('System') != 'CENTRAL_LOYALTY_PROMOTIONS_ENGINE':
-                    continue
-                
-                # Check ARIS tag
-                if vm.tags.get('ARIS') != 'CLPE':
-                    continue
-                
-                # Check Name tag contains 'WEB'
-                name_tag = vm.tags.get('Name', '')
-                if 'WEB' not in name_tag.upper():
-                    continue
-                
-                filtered_vms += 1
-                        if not vm.tags or tag_filter not in vm.tags.values():
-                            continue
-                    
-                    vm_info = {
-                        'name': vm.name,
-                        'resource_group': vm.id.split('/')[4],
-                        'location': vm.location,
-                        'vm_size': vm.hardware_profile.vm_size,
-                        'power_state': 'unknown',
-                        'tags': vm.tags or {}
-                    }
-                    
-                    # Get power state
-                    try:
-                        instance_view = self.compute_client.virtual_machines.instance_view(
-                            vm_info['resource_group'], vm.name
-                        )
-                        for status in instance_view.statuses:
-                            if status.code.startswith('PowerState/'):
-                                vm_info['power_state'] = status.code.split('/')[-1]
-                                break
-                    except Exception as e:
-                        print(f"⚠️  Could not get power state for {vm.name}: {e}")
-                    
-                    vms.append(vm_info)
+            for row in self._iter_clpe_web_vm_rows():
+                power_state = row.get('powerState') or ''
+                vms_append({
+                    'name': row['name'],
+                    'resource_group': row['resourceGroup'],
+                    'location': row['location'],
+                    'vm_size': row['vmSize'],
+                    'power_state': power_state.split('/')[-1] if power_state else 'unknown',
+                    'tags': row['tags'] or {}
+                })
+            
+            # Resource Graph omits the power state for VMs whose instance view it has
+            # not indexed yet; only those need a per-VM instance_view round-trip
+            self._fill_unknown_power_states(vms)
+            
+            vms.sort(key=lambda v: v['name'])
             
             return vms
         except AzureError as e:
@@ -123,20 +322,24 @@ class AzureCLPEServiceHealthChecker:
             print("❌ No Windows VMs found!")
             return None
         
-        print(f"\n✅ Found {len(vms)} Windows VM(s):")
+        lines = [f"\n✅ Found {len(vms)} Windows VM(s):"]
         for i, vm in enumerate(vms, 1):
             status_emoji = "🟢" if vm['power_state'] == 'running' else "🔴"
             tags_str = ", ".join([f"{k}:{v}" for k, v in vm['tags'].items()]) if vm['tags'] else "No tags"
-            print(f"{i}. {vm['name']} (RG: {vm['resource_group']}) - {vm['power_state']} {status_emoji}")
-            print(f"   Size: {vm['vm_size']}, Location: {vm['location']}")
-            print(f"   Tags: {tags_str}")
+            lines.append(f"{i}. {vm['name']} (RG: {vm['resource_group']}) - {vm['power_state']} {status_emoji}")
+            lines.append(f"   Size: {vm['vm_size']}, Location: {vm['location']}")
+            lines.append(f"   Tags: {tags_str}")
+        print("\n".join(lines))
         
         while True:
             try:
-                choice = input(f"\nSelect VM (1-{len(vms)}): ").strip()
-                if choice.lower() in ['q', 'quit', 'exit']:
+                choice = input(f"\nSelect VM (1-{len(vms)}) or 'all' for all VMs: ").strip().lower()
+                if choice in ['q', 'quit', 'exit']:
                     return None
                 
+                if choice == 'all':
+                    return {'all': True, 'vms': vms}
+                
                 vm_index = int(choice) - 1
                 if 0 <= vm_index < len(vms):
                     selected_vm = vms[vm_index]
@@ -153,57 +356,70 @@ class AzureCLPEServiceHealthChecker:
                 else:
                     print("❌ Invalid selection. Please try again.")
             except ValueError:
-                print("❌ Please enter a valid number.")
+                print("❌ Please enter a valid number or 'all'.")
             except KeyboardInterrupt:
                 print("\n👋 Goodbye!")
                 return None
 
-    def check_service_health(self, vm: Dict, service_names: List[str]) -> Dict:
-        """Check the health of specified services on the VM."""
-        print(f"\n🔍 Checking service health on {vm['name']}...")
-        
-        # Create PowerShell script to check services
-        services_list = "', '".join(service_names)
-        powershell_script = f"""
-$services = @('{services_list}')
-$results = @()
-
-foreach ($serviceName in $services) {{
-    try {{
-        $service = Get-Service -Name $serviceName -ErrorAction Stop
-        $processInfo = ""
+    def _run_command_parameters(self, service_names: List[str]) -> Dict:
+        """Build the Run Command request for the given services."""
+        # Service names are bound as a script parameter so the script body is
+        # identical on every call and names are never interpolated into it
+        return {
+            'command_id': 'RunPowerShellScript',
+            'script': [SERVICE_HEALTH_SCRIPT],
+            'parameters': [{'name': 'Services', 'value': ','.join(service_names)}]
+        }
+
+    def _parse_run_command_result(self, run_command_result) -> Dict:
+        """Parse the Run Command output into a service health result."""
+        if run_command_result.value and len(run_command_result.value) > 0:
+            output = run_command_result.value[0].message
+            try:
+                service_results = json_loads(output)
+                return {
+                    'success': True,
+                    'services': service_results if isinstance(service_results, list) else [service_results],
+                    'raw_output': output
+                }
+            except json.JSONDecodeError:
+                return {
+                    'success': False,
+                    'error': 'Failed to parse service information',
+                    'raw_output': output
+                }
+        else:
+            return {
+                'success': False,
+                'error': 'No output received from VM',
+                'raw_output': ''
+            }
+
+    def find_vm(self, vms: List[Dict], vm_name: str) -> Optional[Dict]:
+        """Find a discovered VM by name (case-insensitive)."""
+        vm_name = vm_name.lower()
+        for vm in vms:
+            if vm['name'].lower() == vm_name:
+                return vm
+        return None
+
+    def get_services_to_check(self) -> List[str]:
+        """Prompt for the service names to check."""
+        print("Enter service names to check (one per line, empty line to finish):")
+        print("Examples: W3SVC, MSSQLSERVER, Spooler, Themes")
         
-        if ($service.Status -eq 'Running' -and $service.ServiceType -ne 'Win32ShareProcess') {{
-            try {{
-                $process = Get-Process -Id (Get-WmiObject -Class Win32_Service -Filter "Name='$serviceName'").ProcessId -ErrorAction SilentlyContinue
-                if ($process) {{
-                    $processInfo = "PID: $($process.Id), CPU: $([math]::Round($process.CPU, 2))s, Memory: $([math]::Round($process.WorkingSet64/1MB, 2))MB"
-                }}
-            }} catch {{
-                $processInfo = "Process info unavailable"
-            }}
-        }}
+        services = []
+        while True:
+            service = input("Service name: ").strip()
+            if not service:
+                break
+            services.append(service)
         
-        $results += [PSCustomObject]@{{
-            ServiceName = $serviceName
-            Status = $service.Status
-            StartType = $service.StartType
-            ProcessInfo = $processInfo
-            Error = $null
-        }}
-    }} catch {{
-        $results += [PSCustomObject]@{{
-            ServiceName = $serviceName
-            Status = "NotFound"
-            StartType = "Unknown"
-            ProcessInfo = ""
-            Error = $_.Exception.Message
-        }}
-    }}
-}}
+        return services
 
-$results | ConvertTo-Json -Depth 3
-"""
+    def check_service_health(self, vm: Dict, service_names: List[str]) -> Dict:
+        """Check the health of specified services on the VM."""
+        print(f"\n🔍 Checking service health on {vm['name']}...")
         
         try:
             # Execute the PowerShell script using Azure Run Command
@@ -212,35 +428,37 @@ $results | ConvertTo-Json -Depth 3
             run_command_result = self.compute_client.virtual_machines.begin_run_command(
                 resource_group_name=vm['resource_group'],
                 vm_name=vm['name'],
-                parameters={
-                    'command_id': 'RunPowerShellScript',
-                    'script': [powershell_script],
-                    'parameters': []
-                }
+                parameters=self._run_command_parameters(service_names),
+                polling_interval=RUN_COMMAND_POLLING_INTERVAL
             ).result()
             
-            # Parse the output
-            if run_command_result.value and len(run_command_result.value) > 0:
-                output = run_command_result.value[0].message
-                try:
-                    service_results = json.loads(output)
-                    return {
-                        'success': True,
-                        'services': service_results if isinstance(service_results, list) else [service_results],
-                        'raw_output': output
-                    }
-                except json.JSONDecodeError:
-                    return {
-                        'success': False,
-                        'error': 'Failed to parse service information',
-                        'raw_output': output
-                    }
-            else:
-                return {
-                    'success': False,
-                    'error': 'No output received from VM',
-                    'raw_output': ''
-                }
+            return self._parse_run_command_result(run_command_result)
+                
+        except AzureError as e:
+            return {
+                'success': False,
+                'error': f'Azure API error: {str(e)}',
+                'raw_output': ''
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Unexpected error: {str(e)}',
+                'raw_output': ''
+            }
+
+    async def check_service_health_async(self, client, vm: Dict, service_names: List[str]) -> Dict:
+        """Check the health of specified services on the VM using the async compute client."""
+        try:
+            poller = await client.virtual_machines.begin_run_command(
+                resource_group_name=vm['resource_group'],
+                vm_name=vm['name'],
+                parameters=self._run_command_parameters(service_names),
+                polling_interval=RUN_COMMAND_POLLING_INTERVAL
+            )
+            run_command_result = await poller.result()
+            
+            return self._parse_run_command_result(run_command_result)
                 
         except AzureError as e:
             return {
@@ -255,6 +473,22 @@ $results | ConvertTo-Json -Depth 3
                 'raw_output': ''
             }
 
+    async def check_many(self, vms: List[Dict], service_names: List[str]) -> List[Dict]:
+        """Check the specified services on several VMs concurrently."""
+        print(f"\n🔍 Checking service health on {len(vms)} VM(s) concurrently...")
+        print("⏳ Executing service health checks...")
+        
+        credential = AsyncCachedTokenCredential(self.credential)
+        connector = aiohttp.TCPConnector(limit_per_host=HTTP_POOL_SIZE)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            transport = AioHttpTransport(session=session, session_owner=False)
+            async with AsyncComputeManagementClient(
+                credential, self.subscription_id, transport=transport, **AZURE_RETRY_OPTIONS
+            ) as client:
+                return await asyncio.gather(
+                    *(self.check_service_health_async(client, vm, service_names) for vm in vms)
+                )
+
     def display_service_results(self, results: Dict):
         """Display service health check results in a formatted way."""
         if not results['success']:
@@ -292,53 +526,20 @@ $results | ConvertTo-Json -Depth 3
         
         print("\n" + "=" * 80)
 
-    def run_health_check(self):
-        """Main method to run the service health check."""
-        print("🏥 Azure Windows VM Service Health Checker")
-        print("=" * 50)
-        
-        # Get VMs
-        vms = self.get_windows_vms()
-        
-        # Select VM
-        selected_vm = self.select_vm(vms)
-        if not selected_vm:
-            print("👋 No VM selected. Exiting.")
-            return
-        
-        # Get services to check
-        print(f"\n🔧 Service Health Check for: {selected_vm['name']}")
-        print("Enter service names to check (one per line, empty line to finish):")
-        print("Examples: W3SVC, MSSQLSERVER, Spooler, Themes")
-        
-        services = []
-        while True:
-            service = input("Service name: ").strip()
-            if not service:
-                break
-            services.append(service)
-        
-        if not services:
-            print("❌ No services specified. Exiting.")
-            return
-        
-        print(f"\n🎯 Will check {len(services)} service(s): {', '.join(services)}")
-        confirm = input("Proceed with health check? (y/N): ").strip().lower()
-        if confirm != 'y':
-            print("👋 Health check cancelled.")
-            return
-        
-        # Perform health check
-        results = self.check_service_health(selected_vm, services)
-        
-        # Display results
-        self.display_service_results(results)
-        
-        print(f"\n✅ Service health check completed for {selected_vm['name']}!")
-
 
 def main():
     """Main function for CLPE WEB VM Service Health Checker."""
+    parser = argparse.ArgumentParser(description="Azure CLPE WEB VM Service Health Checker")
+    parser.add_argument('--only-running', action='store_true',
+                        help="only list VMs whose discovered power state is 'running'")
+    parser.add_argument('--services', type=lambda value: [name.strip() for name in value.split(',') if name.strip()],
+                        help="comma-separated service names to check, e.g. W3SVC,MSSQLSERVER")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--vm-name', help="check this CLPE WEB VM instead of prompting for one")
+    target.add_argument('--all-vms', action='store_true', help="check all discovered CLPE WEB VMs")
+    parser.add_argument('-y', '--yes', action='store_true', help="answer yes to all confirmation prompts")
+    args = parser.parse_args()
+    
     print("🏥 Azure CLPE WEB VM Service Health Checker")
     print("=" * 60)
     print("🔒 RESTRICTED: Integration Testing - CLPE WEB VMs Only")
@@ -356,12 +557,13 @@ def main():
     print()
     
     # Confirmation prompt
-    confirm = input("🔐 This script will only work with CLPE WEB VMs in Integration Testing.\n"
-                   "   Do you want to continue? (y/N): ").strip().lower()
-    
-    if confirm != 'y':
-        print("❌ Operation cancelled.")
-        return
+    if not args.yes:
+        confirm = input("🔐 This script will only work with CLPE WEB VMs in Integration Testing.\n"
+                       "   Do you want to continue? (y/N): ").strip().lower()
+        
+        if confirm != 'y':
+            print("❌ Operation cancelled.")
+            return
     
     try:
         # Initialize checker with hardcoded subscription
@@ -370,6 +572,12 @@ def main():
         # Get CLPE WEB VMs
         vms = checker.get_clpe_web_vms()
         
+        if args.only_running:
+            running_vms = [vm for vm in vms if vm['power_state'] == 'running']
+            if len(running_vms) < len(vms):
+                print(f"⏭️  Skipping {len(vms) - len(running_vms)} CLPE WEB VM(s) that are not running")
+            vms = running_vms
+        
         if not vms:
             print("❌ No CLPE WEB VMs found matching the criteria.")
             print("\n📋 Troubleshooting:")
@@ -379,31 +587,60 @@ def main():
             print("     - ARIS: CLPE")
             print("     - Name: (must contain 'WEB')")
             print("   • Ensure VMs are running and accessible")
-            return
+            sys.exit(1)
         
-        # Select VM
-        selected_vm = checker.select_clpe_web_vm(vms)
-        if not selected_vm:
+        # Select VM(s)
+        if args.all_vms:
+            selection = {'all': True, 'vms': vms}
+        elif args.vm_name:
+            selection = checker.find_vm(vms, args.vm_name)
+            if not selection:
+                print(f"❌ CLPE WEB VM '{args.vm_name}' not found.")
+                sys.exit(1)
+            if selection['power_state'] != 'running':
+                print(f"⚠️  Warning: VM is not in running state ({selection['power_state']})")
+                if not args.yes and input("Continue anyway? (y/N): ").strip().lower() != 'y':
+                    return
+        else:
+            selection = checker.select_vm(vms)
+        if not selection:
             print("❌ No CLPE WEB VM selected.")
             return
         
         # Get services to check
-        services = checker.get_services_to_check()
+        services = args.services or checker.get_services_to_check()
         if not services:
             print("❌ No services specified for health check.")
             return
         
-        print(f"\n🔍 Performing service health check on CLPE WEB VM: {selected_vm['name']}")
-        print(f"📋 Services to check: {', '.join(services)}")
-        
-        # Perform health check
-        results = checker.check_service_health(selected_vm, services)
-        
-        # Display results
-        checker.display_service_results(results)
-        
-        print(f"\n✅ CLPE WEB VM service health check completed for {selected_vm['name']}!")
+        if selection.get('all'):
+            print(f"\n🔍 Performing service health check on all {len(selection['vms'])} CLPE WEB VMs")
+            print(f"📋 Services to check: {', '.join(services)}")
+            
+            # Run Command executions overlap instead of running back to back
+            all_results = asyncio.run(checker.check_many(selection['vms'], services))
+            
+            for i, (vm, results) in enumerate(zip(selection['vms'], all_results)):
+                if i:
+                    print("\n" + "─" * 80 + "\n")
+                print(f"\n🖥️  CLPE WEB VM: {vm['name']}")
+                checker.display_service_results(results)
+            
+            print(f"\n✅ CLPE WEB VM service health check completed for {len(selection['vms'])} VMs!")
+        else:
+            print(f"\n🔍 Performing service health check on CLPE WEB VM: {selection['name']}")
+            print(f"📋 Services to check: {', '.join(services)}")
+            
+            # Perform health check
+            results = checker.check_service_health(selection, services)
+            
+            # Display results
+            checker.display_service_results(results)
+            
+            print(f"\n✅ CLPE WEB VM service health check completed for {selection['name']}!")
         
+    except KeyboardInterrupt:
+        print("\n👋 Goodbye!")
     except Exception as e:
         print(f"❌ Error: {e}")
         print("\n🔧 Troubleshooting:")
@@ -411,18 +648,6 @@ def main():
         print("   • Check subscription access: az account show")
         print("   • Ensure VM Agent is installed and running")
         print("   • Verify network connectivity to Azure")
-    
-    try:
-        # Initialize checker
-        checker = AzureServiceHealthChecker(subscription_id)
-        
-        # Run health check
-        checker.run_health_check()
-        
-    except KeyboardInterrupt:
-        print("\n👋 Goodbye!")
-    except Exception as e:
-        print(f"❌ Unexpected error: {e}")
         sys.exit(1)
 
 
@@ -11,37 +11,326 @@ Windows Virtual Machines in the Integration Testing subscription using Azure Run
 - Service: ncrpes.exe monitoring
 """
 
+import argparse
+import asyncio
+import contextlib
+import functools
 import json
+import os
 import sys
 import time
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 try:
     from azure.identity import DefaultAzureCredential
     from azure.mgmt.compute import ComputeManagementClient
+    from azure.mgmt.compute.aio import ComputeManagementClient as AsyncComputeManagementClient
     from azure.mgmt.resource import ResourceManagementClient
     from azure.core.exceptions import AzureError
+    from azure.core.pipeline.transport import AioHttpTransport, RequestsTransport
+    import aiohttp
+    import requests
+    from requests.adapters import HTTPAdapter
 except ImportError:
     print("❌ Required Azure libraries not found!")
-    print("Install with: pip install azure-identity azure-mgmt-compute azure-mgmt-resource")
+    print("Install with: pip install azure-identity azure-mgmt-compute azure-mgmt-resource aiohttp")
     sys.exit(1)
 
+# Optional faster parser for the Run Command output
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+# Connections kept open per host by both the sync and async transports,
+# enough for one Run Command submit/poll per VM
+HTTP_POOL_SIZE = 32
+
+# Token scope for Azure Resource Manager
+MANAGEMENT_SCOPE = "https://management.azure.com/.default"
+
+# Authentication is via environment variables, managed identity or Azure CLI, as the
+# README documents; the other credentials DefaultAzureCredential can exclude are skipped.
+# (Newer azure-identity may still try a broker credential if azure-identity-broker is installed.)
+CREDENTIAL_OPTIONS = {
+    'exclude_interactive_browser_credential': True,
+    'exclude_shared_token_cache_credential': True,
+    'exclude_visual_studio_code_credential': True,
+    'exclude_powershell_credential': True,
+    'exclude_workload_identity_credential': True,
+    'exclude_developer_cli_credential': True,
+}
+
+# A cached token is renewed once it is this close to expiring
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+# The discovered CLPE VM inventory (not power state) is cached on disk for this many
+# seconds, so reruns skip listing every VM in the subscription
+VM_CACHE_TTL_SECONDS = 3600
+
+# Azure keeps only the last 4,096 bytes of a Run Command's StdOut, and each VM's
+# compressed report takes roughly 700-900 bytes of the fan-out output, so one
+# fan-out Run Command checks at most this many VMs
+FANOUT_MAX_VMS = 4
+
+# Metrics written by --format prom, in output order: (name, type, help)
+PROMETHEUS_METRICS = [
+    ('ncrpes_check_success', 'gauge', 'Whether the ncrpes.exe check ran and returned a report'),
+    ('ncrpes_service_up', 'gauge', 'Whether the ncrpes service is Running'),
+    ('ncrpes_process_count', 'gauge', 'Number of ncrpes.exe processes'),
+    ('ncrpes_process_cpu_seconds_total', 'counter', 'Processor time used by the ncrpes.exe process'),
+    ('ncrpes_process_working_set_megabytes', 'gauge', 'Working set of the ncrpes.exe process'),
+    ('ncrpes_process_handles', 'gauge', 'Open handles of the ncrpes.exe process'),
+    ('ncrpes_process_threads', 'gauge', 'Threads of the ncrpes.exe process'),
+    ('clpe_vm_cpu_usage_percent', 'gauge', 'Total processor usage of the VM'),
+    ('clpe_vm_memory_usage_percent', 'gauge', 'Physical memory usage of the VM'),
+]
+
+
+class CachedTokenCredential:
+    """Hand every client the same token until it is about to expire.
+
+    AzureCliCredential does not cache tokens, so without this each client
+    would run `az account get-access-token` again for its own token.
+    """
+
+    def __init__(self, credential):
+        self._credential = credential
+        self._tokens = {}
+
+    def get_token(self, *scopes, **kwargs):
+        # A claims challenge means the cached token was rejected, so it always goes to the credential
+        if kwargs.get('claims'):
+            return self._credential.get_token(*scopes, **kwargs)
+        key = (scopes, tuple(sorted(kwargs.items())))
+        token = self._tokens.get(key)
+        if token is None or token.expires_on - TOKEN_REFRESH_MARGIN_SECONDS < time.time():
+            token = self._credential.get_token(*scopes, **kwargs)
+            self._tokens[key] = token
+        return token
+
+
+class AsyncCachedTokenCredential:
+    """Async view of a CachedTokenCredential, so the aio clients share its token."""
+
+    def __init__(self, credential: CachedTokenCredential):
+        self._credential = credential
+
+    async def get_token(self, *scopes, **kwargs):
+        # Normally answered from the cache; a renewal runs the sync credential in a worker thread
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, functools.partial(self._credential.get_token, *scopes, **kwargs))
+
+    async def close(self):
+        pass
+
 
 class CLPENCRPESMonitor:
-    def __init__(self):
-        """Initialize the CLPE NCRPES Monitor."""
+    # PowerShell script to check the ncrpes service, ncrpes.exe processes and system performance
+    _PS_SCRIPT = r"""
+$serviceName = "ncrpes"
+$processName = "ncrpes"
+$results = @{}
+
+# Check if ncrpes service exists
+try {
+    $service = Get-Service -Name $serviceName -ErrorAction Stop
+    $results.ServiceFound = $true
+    $results.ServiceName = $service.Name
+    $results.ServiceDisplayName = $service.DisplayName
+    $results.ServiceStatus = $service.Status.ToString()
+    $results.ServiceStartType = $service.StartType.ToString()
+} catch {
+    $results.ServiceFound = $false
+    $results.ServiceError = $_.Exception.Message
+}
+
+# Check for ncrpes.exe process
+try {
+    $processes = Get-Process -Name $processName -ErrorAction SilentlyContinue
+    if ($processes) {
+        $results.ProcessFound = $true
+        $results.ProcessCount = $processes.Count
+        
+        # Project every process in a single pipeline pass and stream one compact record each
+        $processes |
+            Select-Object @{n='PID'; e={ $_.Id }},
+                ProcessName,
+                @{n='StartTime'; e={ if ($_.StartTime) { $_.StartTime.ToString("yyyy-MM-dd HH:mm:ss") } else { "Unknown" } }},
+                @{n='CPU'; e={ [math]::Round($_.CPU, 2) }},
+                @{n='WorkingSet'; e={ [math]::Round($_.WorkingSet64/1MB, 2) }},
+                @{n='VirtualMemory'; e={ [math]::Round($_.VirtualMemorySize64/1MB, 2) }},
+                HandleCount,
+                @{n='ThreadCount'; e={ $_.Threads.Count }} |
+            ForEach-Object { @{ Process = $_ } | ConvertTo-Json -Compress }
+    } else {
+        $results.ProcessFound = $false
+    }
+} catch {
+    $results.ProcessFound = $false
+    $results.ProcessError = $_.Exception.Message
+}
+
+# Check system performance
+try {
+    # One processor-time counter read instead of instantiating every Win32_Processor
+    $cpuUsage = (Get-Counter -Counter '\Processor(_Total)\% Processor Time').CounterSamples[0].CookedValue
+    $memory = Get-CimInstance -ClassName Win32_OperatingSystem
+    $results.SystemInfo = @{
+        CPUUsage = [math]::Round($cpuUsage, 2)
+        TotalMemoryGB = [math]::Round($memory.TotalVisibleMemorySize/1MB, 2)
+        FreeMemoryGB = [math]::Round($memory.FreePhysicalMemory/1MB, 2)
+        MemoryUsagePercent = [math]::Round((($memory.TotalVisibleMemorySize - $memory.FreePhysicalMemory) / $memory.TotalVisibleMemorySize) * 100, 2)
+    }
+} catch {
+    $results.SystemInfo = @{ Error = $_.Exception.Message }
+}
+
+# Add timestamp
+$results.Timestamp = (Get-Date).ToString("yyyy-MM-dd HH:mm:ss")
+$results.ComputerName = $env:COMPUTERNAME
+
+Write-Output (@{ Report = $results } | ConvertTo-Json -Compress -Depth 3)
+"""
+
+    def __init__(self, fanout_vm_name: Optional[str] = None, select_all: bool = False,
+                 assume_yes: bool = False, output_format: str = 'human', refresh_vms: bool = False):
+        """Initialize the CLPE NCRPES Monitor.
+
+        If fanout_vm_name names one of the selected CLPE VMs, monitoring 'all' VMs
+        runs a single Run Command on it that fans out to the others over WinRM.
+        select_all and assume_yes skip the VM selection and confirmation prompts.
+        output_format is 'human', 'json' (one JSON line per VM) or 'prom'
+        (Prometheus text format). refresh_vms ignores the cached VM inventory.
+        """
         # Integration Testing subscription ID
         self.subscription_id = "5b479b96-2b99-464d-a824-2761380620ea"
         self.clpe_tag = "System:CENTRAL_LOYALTY_PROMOTIONS_ENGINE"
+        # Split once so discovery can do a single dict lookup per VM
+        self.clpe_tag_key, self.clpe_tag_value = self.clpe_tag.split(':', 1)
         self.service_name = "ncrpes.exe"
+        self.fanout_vm_name = fanout_vm_name
+        self.select_all = select_all
+        self.assume_yes = assume_yes
+        self.output_format = output_format
+        self.refresh_vms = refresh_vms
+        self.vm_cache_path = os.path.join(
+            os.path.expanduser('~'), '.cache', f'clpe_ncrpes_vms_{self.subscription_id}.json'
+        )
+        
+        self.credential = CachedTokenCredential(DefaultAzureCredential(**CREDENTIAL_OPTIONS))
+        # Resolve the working credential and fetch the ARM token up front; every
+        # client then reuses this token instead of requesting its own
+        self.credential.get_token(MANAGEMENT_SCOPE)
+        
+        # One pooled session for both clients
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount('https://', adapter)
+        self.transport = RequestsTransport(
+            session=session, session_owner=False, connection_timeout=10, connection_verify=True
+        )
+        
+        self.compute_client = ComputeManagementClient(
+            self.credential, self.subscription_id, transport=self.transport
+        )
+        self.resource_client = ResourceManagementClient(
+            self.credential, self.subscription_id, transport=self.transport
+        )
+
+    def _get_power_states(self) -> Dict[Tuple[str, str], str]:
+        """Get the power state of every VM in the subscription, keyed by (resource group, name)."""
+        power_states = {}
+        for vm in self.compute_client.virtual_machines.list_all(status_only='true'):
+            if not (vm.instance_view and vm.instance_view.statuses):
+                continue
+            for status in vm.instance_view.statuses:
+                if status.code and status.code.startswith('PowerState/'):
+                    power_states[(vm.id.split('/', 5)[4].lower(), vm.name.lower())] = status.code.split('/')[-1]
+                    break
+        return power_states
+
+    def _get_power_state(self, vm_info: Dict) -> str:
+        """Get the power state of a single VM from its instance view."""
+        try:
+            instance_view = self.compute_client.virtual_machines.instance_view(
+                vm_info['resource_group'], vm_info['name']
+            )
+            for status in instance_view.statuses:
+                if status.code.startswith('PowerState/'):
+                    return status.code.split('/')[-1]
+        except Exception as e:
+            print(f"⚠️  Could not get power state for {vm_info['name']}: {e}")
+        return 'unknown'
+
+    def _fill_power_states(self, vms: List[Dict]):
+        """Set each VM's power state and report it as found."""
+        if not vms:
+            return
+        
+        # One status-only listing returns every VM's power state, instead of an
+        # instance_view round-trip per matching VM
+        try:
+            power_states = self._get_power_states()
+        except AzureError as e:
+            # Keep the VMs; each one falls back to its own instance view
+            print(f"⚠️  Could not list VM power states: {e}")
+            power_states = {}
         
-        self.credential = DefaultAzureCredential()
-        self.compute_client = ComputeManagementClient(self.credential, self.subscription_id)
-        self.resource_client = ResourceManagementClient(self.credential, self.subscription_id)
+        for vm_info in vms:
+            key = (vm_info['resource_group'].lower(), vm_info['name'].lower())
+            vm_info['power_state'] = power_states.get(key) or self._get_power_state(vm_info)
+            print(f"✅ Found CLPE WEB VM: {vm_info['name']} "
+                  f"(Name: {vm_info['tags'].get('Name', '')}) - {vm_info['power_state']}")
 
-    def get_clpe_vms(self) -> List[Dict]:
+    def _load_cached_vms(self) -> Optional[List[Dict]]:
+        """Load the discovered VM inventory from the local cache if it is still fresh."""
+        try:
+            if os.path.getmtime(self.vm_cache_path) > time.time() - VM_CACHE_TTL_SECONDS:
+                with open(self.vm_cache_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def _save_cached_vms(self, vms: List[Dict]):
+        """Write the discovered VM inventory to the local cache, leaving out power state."""
+        try:
+            os.makedirs(os.path.dirname(self.vm_cache_path), exist_ok=True)
+            with open(self.vm_cache_path, 'w', encoding='utf-8') as f:
+                json.dump([{k: v for k, v in vm.items() if k != 'power_state'} for vm in vms], f)
+        except OSError as e:
+            print(f"⚠️  Could not write VM cache {self.vm_cache_path}: {e}")
+
+    def _matches_clpe_web_tags(self, tags: Optional[Dict]) -> bool:
+        """Check the System and ARIS tags and that the Name tag contains 'WEB'."""
+        if not tags:
+            return False
+        
+        # Check System tag
+        if tags.get(self.clpe_tag_key) != self.clpe_tag_value:
+            return False
+        
+        # Check ARIS tag
+        if tags.get('ARIS') != 'CLPE':
+            return False
+        
+        # Check Name tag contains 'WEB'
+        return 'WEB' in tags.get('Name', '').upper()
+
+    def get_clpe_vms(self, force_refresh: bool = False) -> List[Dict]:
         """Get CLPE WEB Windows VMs with specific tags in the integration subscription."""
+        if not force_refresh:
+            cached_vms = self._load_cached_vms()
+            # Never trust a cache entry that no longer satisfies the tag restriction
+            if cached_vms and all(self._matches_clpe_web_tags(vm.get('tags')) for vm in cached_vms):
+                print("📦 Using cached CLPE WEB VM list (run with --refresh to rediscover)")
+                # Power state changes far more often than the inventory, so it is never cached
+                vms = [dict(vm, power_state='unknown') for vm in cached_vms]
+                self._fill_power_states(vms)
+                return vms
+        
         print("🔍 Discovering CLPE WEB VMs...")
         print("📋 Required criteria:")
         print("   • Subscription: Integration Testing (5b479b96-2b99-464d-a824-2761380620ea)")
@@ -59,34 +348,22 @@ class CLPENCRPESMonitor:
             for vm in self.compute_client.virtual_machines.list_all():
                 total_vms += 1
                 
+                # Check required tags first - plain dict lookups that rule out
+                # most of the subscription before touching the storage profile
+                if not self._matches_clpe_web_tags(vm.tags):
+                    continue
+                
                 # Check if it's a Windows VM
                 if not (vm.storage_profile and vm.storage_profile.os_disk and 
                        vm.storage_profile.os_disk.os_type and
                        vm.storage_profile.os_disk.os_type.name.lower() == 'windows'):
                     continue
                 
-                # Check required tags
-                if not vm.tags:
-                    continue
-                
-                # Check System tag
-                if vm.tags.get('System') != 'CENTRAL_LOYALTY_PROMOTIONS_ENGINE':
-                    continue
-                
-                # Check ARIS tag
-                if vm.tags.get('ARIS') != 'CLPE':
-                    continue
-                
-                # Check Name tag contains 'WEB'
-                name_tag = vm.tags.get('Name', '')
-                if 'WEB' not in name_tag.upper():
-                    continue
-                
                 filtered_vms += 1
                 
                 vm_info = {
                     'name': vm.name,
-                    'resource_group': vm.id.split('/')[4],
+                    'resource_group': vm.id.split('/', 5)[4],
                     'location': vm.location,
                     'vm_size': vm.hardware_profile.vm_size,
                     'power_state': 'unknown',
@@ -94,20 +371,9 @@ class CLPENCRPESMonitor:
                     'os_version': 'Windows Server 2016 Datacenter'  # Based on your README
                 }
                 
-                # Get power state
-                try:
-                    instance_view = self.compute_client.virtual_machines.instance_view(
-                        vm_info['resource_group'], vm.name
-                    )
-                    for status in instance_view.statuses:
-                        if status.code.startswith('PowerState/'):
-                            vm_info['power_state'] = status.code.split('/')[-1]
-                            break
-                except Exception as e:
-                    print(f"⚠️  Could not get power state for {vm.name}: {e}")
-                
                 vms.append(vm_info)
-                print(f"✅ Found CLPE WEB VM: {vm.name} (Name: {name_tag}) - {vm_info['power_state']}")
+            
+            self._fill_power_states(vms)
             
             print(f"\n📊 VM Discovery Results:")
             print(f"   • Total VMs in subscription: {total_vms}")
@@ -122,6 +388,9 @@ class CLPENCRPESMonitor:
                 print("   • VMs are Windows-based")
                 print("   • You're connected to Integration Testing subscription")
             
+            if vms:
+                self._save_cached_vms(vms)
+            
             return vms
         except AzureError as e:
             print(f"❌ Error fetching CLPE WEB VMs: {e}")
@@ -151,12 +420,19 @@ class CLPENCRPESMonitor:
             print(f"   📍 Location: {vm['location']}")
             print()
         
+        if self.select_all:
+            print(f"🎯 Selected all {len(vms)} CLPE WEB VMs")
+            return {'all': True, 'vms': vms}
+        
         while True:
             try:
-                choice = input(f"Select CLPE WEB VM (1-{len(vms)}) or 'q' to quit: ").strip()
-                if choice.lower() == 'q':
+                choice = input(f"Select CLPE WEB VM (1-{len(vms)}), 'all' for all VMs or 'q' to quit: ").strip().lower()
+                if choice == 'q':
                     return None
                 
+                if choice == 'all':
+                    return {'all': True, 'vms': vms}
+                
                 index = int(choice) - 1
                 if 0 <= index < len(vms):
                     selected_vm = vms[index]
@@ -165,226 +441,276 @@ class CLPENCRPESMonitor:
                 else:
                     print(f"❌ Please enter a number between 1 and {len(vms)}")
             except ValueError:
-                print("❌ Please enter a valid number or 'q' to quit")
-        for i, vm in enumerate(vms, 1):
-            status_emoji = "🟢" if vm['power_state'] == 'running' else "🔴"
-            vm_type = "Database Server" if "DB" in vm['name'].upper() else "Web Server"
-            print(f"{i}. {vm['name']} - {vm_type}")
-            print(f"   Resource Group: {vm['resource_group']}")
-            print(f"   Status: {vm['power_state']} {status_emoji}")
-            print(f"   Size: {vm['vm_size']}")
-            print(f"   OS: {vm['os_version']}")
+                print("❌ Please enter a valid number, 'all' or 'q' to quit")
+
+    def _run_command_parameters(self) -> Dict:
+        """Build the Run Command parameters for the ncrpes.exe check."""
+        return {
+            'command_id': 'RunPowerShellScript',
+            'script': [self._PS_SCRIPT],
+            'parameters': []
+        }
+
+    def _parse_run_command_result(self, vm: Dict, run_command_result) -> Dict:
+        """Turn a finished ncrpes.exe Run Command into a monitoring result."""
+        if run_command_result.value and len(run_command_result.value) > 0:
+            return self._parse_ncrpes_output(vm, run_command_result.value[0].message)
+        return {
+            'success': False,
+            'vm_name': vm['name'],
+            'error': 'No output received from VM',
+            'raw_output': ''
+        }
+
+    def _parse_ncrpes_output(self, vm: Dict, output: str) -> Dict:
+        """Parse the newline-delimited JSON records produced by the ncrpes.exe check script."""
+        service_results = {}
+        processes = []
+        try:
+            # Each line is a compact {"Report": {...}} or {"Process": {...}} record
+            for line in output.splitlines():
+                line = line.strip()
+                if not line:
+                    continue
+                record = json_loads(line)
+                if not isinstance(record, dict):
+                    continue
+                if 'Process' in record:
+                    processes.append(record['Process'])
+                elif 'Report' in record:
+                    service_results.update(record['Report'])
+        except json.JSONDecodeError:
+            service_results = {}
         
-        while True:
-            try:
-                choice = input(f"\nSelect CLPE VM (1-{len(vms)}) or 'all' for all VMs: ").strip().lower()
-                if choice in ['q', 'quit', 'exit']:
-                    return None
-                
-                if choice == 'all':
-                    return {'all': True, 'vms': vms}
-                
-                vm_index = int(choice) - 1
-                if 0 <= vm_index < len(vms):
-                    selected_vm = vms[vm_index]
-                    print(f"\n📋 Selected CLPE VM: {selected_vm['name']}")
-                    print(f"Power State: {selected_vm['power_state']}")
-                    
-                    if selected_vm['power_state'] != 'running':
-                        print("⚠️  Warning: VM is not in running state")
-                        confirm = input("Continue anyway? (y/N): ").strip().lower()
-                        if confirm != 'y':
-                            return None
-                    
-                    return selected_vm
-                else:
-                    print("❌ Invalid selection. Please try again.")
-            except ValueError:
-                print("❌ Please enter a valid number or 'all'.")
-            except KeyboardInterrupt:
-                print("\n👋 Goodbye!")
-                return None
+        if not service_results:
+            return {
+                'success': False,
+                'vm_name': vm['name'],
+                'error': 'Failed to parse service information',
+                'raw_output': output
+            }
+        
+        service_results['Processes'] = processes
+        return {
+            'success': True,
+            'vm_name': vm['name'],
+            'data': service_results,
+            'raw_output': output
+        }
+
+    def _ncrpes_error(self, vm: Dict, error: Exception) -> Dict:
+        """Build the failed monitoring result for an error raised while checking the VM."""
+        if isinstance(error, AzureError):
+            message = f'Azure API error: {str(error)}'
+        else:
+            message = f'Unexpected error: {str(error)}'
+        return {
+            'success': False,
+            'vm_name': vm['name'],
+            'error': message,
+            'raw_output': ''
+        }
 
     def monitor_ncrpes_service(self, vm: Dict) -> Dict:
         """Monitor the ncrpes.exe service on the specified CLPE VM."""
         print(f"\n🔍 Monitoring ncrpes.exe service on {vm['name']}...")
         
-        # PowerShell script to check ncrpes.exe service and process
-        powershell_script = f"""
-$serviceName = "ncrpes"
-$processName = "ncrpes"
-$results = @{{}}
+        try:
+            # Execute the PowerShell script using Azure Run Command
+            print("⏳ Executing NCRPES service check...")
+            
+            run_command_result = self.compute_client.virtual_machines.begin_run_command(
+                resource_group_name=vm['resource_group'],
+                vm_name=vm['name'],
+                parameters=self._run_command_parameters()
+            ).result()
+            
+            return self._parse_run_command_result(vm, run_command_result)
+        except Exception as e:
+            return self._ncrpes_error(vm, e)
 
-# Check if ncrpes service exists
-try {{
-    $service = Get-Service -Name $serviceName -ErrorAction Stop
-    $results.ServiceFound = $true
-    $results.ServiceName = $service.Name
-    $results.ServiceDisplayName = $service.DisplayName
-    $results.ServiceStatus = $service.Status.ToString()
-    $results.ServiceStartType = $service.StartType.ToString()
-}} catch {{
-    $results.ServiceFound = $false
-    $results.ServiceError = $_.Exception.Message
-}}
+    async def _monitor_async(self, client, vm: Dict) -> Dict:
+        """Monitor the ncrpes.exe service on the VM using the async compute client."""
+        try:
+            poller = await client.virtual_machines.begin_run_command(
+                resource_group_name=vm['resource_group'],
+                vm_name=vm['name'],
+                parameters=self._run_command_parameters()
+            )
+            run_command_result = await poller.result()
+            
+            return self._parse_run_command_result(vm, run_command_result)
+        except Exception as e:
+            return self._ncrpes_error(vm, e)
 
-# Check for ncrpes.exe process
-try {{
-    $processes = Get-Process -Name $processName -ErrorAction SilentlyContinue
-    if ($processes) {{
-        $results.ProcessFound = $true
-        $results.ProcessCount = $processes.Count
-        $results.Processes = @()
-        
-        foreach ($proc in $processes) {{
-            $processInfo = @{{
-                PID = $proc.Id
-                ProcessName = $proc.ProcessName
-                StartTime = if ($proc.StartTime) {{ $proc.StartTime.ToString("yyyy-MM-dd HH:mm:ss") }} else {{ "Unknown" }}
-                CPU = [math]::Round($proc.CPU, 2)
-                WorkingSet = [math]::Round($proc.WorkingSet64/1MB, 2)
-                VirtualMemory = [math]::Round($proc.VirtualMemorySize64/1MB, 2)
-                HandleCount = $proc.HandleCount
-                ThreadCount = $proc.Threads.Count
-            }}
-            $results.Processes += $processInfo
-        }}
-    }} else {{
-        $results.ProcessFound = $false
+    async def monitor_many_async(self, vms: List[Dict]) -> List[Dict]:
+        """Monitor ncrpes.exe on several CLPE VMs concurrently on one event loop."""
+        print("⏳ Executing NCRPES service checks...")
+        
+        # Same token and connection limit as the sync clients
+        credential = AsyncCachedTokenCredential(self.credential)
+        connector = aiohttp.TCPConnector(limit_per_host=HTTP_POOL_SIZE)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            transport = AioHttpTransport(session=session, session_owner=False, connection_timeout=10)
+            async with AsyncComputeManagementClient(credential, self.subscription_id, transport=transport) as client:
+                return await asyncio.gather(*(self._monitor_async(client, vm) for vm in vms))
+
+    def monitor_many(self, vms: List[Dict]) -> List[Dict]:
+        """Monitor ncrpes.exe on several CLPE VMs, returning one result per VM in order."""
+        return asyncio.run(self.monitor_many_async(vms))
+
+    def run_ncrpes_fanout(self, vms: List[Dict], fanout_vm: Dict) -> List[Dict]:
+        """Monitor ncrpes.exe on several VMs with a single Run Command on one of them.
+
+        The fan-out VM runs the check on every target with Invoke-Command over
+        WinRM, so it must be able to reach each VM by its computer name. The
+        remote sessions run as the fan-out VM's computer account (Run Command
+        executes as SYSTEM), which needs administrator rights over WinRM on
+        every target. Only the first FANOUT_MAX_VMS VMs go through the fan-out;
+        the rest, and any VM the fan-out returns no usable report for, are
+        checked directly with their own Run Command.
+        """
+        targets = vms[:FANOUT_MAX_VMS]
+        print(f"\n🔍 Monitoring ncrpes.exe on {len(targets)} CLPE VMs via {fanout_vm['name']}...")
+        if len(vms) > len(targets):
+            print(f"⚠️  Run Command output is limited to 4 KB; checking the other "
+                  f"{len(vms) - len(targets)} VM(s) directly")
+        
+        # The per-VM check runs remotely as a script block; target names are bound as a parameter
+        fanout_script = f"""
+param([string]$Computers)
+
+$computerList = $Computers -split ','
+$scriptBlock = [scriptblock]::Create(@'
+{self._PS_SCRIPT}
+'@)
+
+$output = @(Invoke-Command -ComputerName $computerList -ScriptBlock $scriptBlock -ThrottleLimit 32 -ErrorAction SilentlyContinue -ErrorVariable remoteErrors)
+
+$results = @()
+# The check writes one record per line, so rejoin each computer's lines into one output
+foreach ($group in ($output | Group-Object -Property PSComputerName)) {{
+    $results += [PSCustomObject]@{{
+        ComputerName = $group.Name
+        Output = ($group.Group | ForEach-Object {{ [string]$_ }}) -join "`n"
+        Error = $null
     }}
-}} catch {{
-    $results.ProcessFound = $false
-    $results.ProcessError = $_.Exception.Message
 }}
-
-# Check system performance
-try {{
-    $cpu = Get-WmiObject -Class Win32_Processor | Measure-Object -Property LoadPercentage -Average
-    $memory = Get-WmiObject -Class Win32_OperatingSystem
-    $results.SystemInfo = @{{
-        CPUUsage = [math]::Round($cpu.Average, 2)
-        TotalMemoryGB = [math]::Round($memory.TotalVisibleMemorySize/1MB, 2)
-        FreeMemoryGB = [math]::Round($memory.FreePhysicalMemory/1MB, 2)
-        MemoryUsagePercent = [math]::Round((($memory.TotalVisibleMemorySize - $memory.FreePhysicalMemory) / $memory.TotalVisibleMemorySize) * 100, 2)
+foreach ($remoteError in $remoteErrors) {{
+    $computerName = if ($remoteError.OriginInfo) {{ $remoteError.OriginInfo.PSComputerName }} else {{ [string]$remoteError.TargetObject }}
+    $results += [PSCustomObject]@{{
+        ComputerName = $computerName
+        Output = $null
+        Error = $remoteError.Exception.Message
     }}
-}} catch {{
-    $results.SystemInfo = @{{ Error = $_.Exception.Message }}
 }}
 
-# Add timestamp
-$results.Timestamp = (Get-Date).ToString("yyyy-MM-dd HH:mm:ss")
-$results.ComputerName = $env:COMPUTERNAME
-
-$results | ConvertTo-Json -Depth 4
+# Compressed, since everything past the 4 KB StdOut limit is cut off
+ConvertTo-Json -InputObject $results -Depth 3 -Compress
 """
         
+        entries = []
         try:
-            # Execute the PowerShell script using Azure Run Command
-            print("⏳ Executing NCRPES service check...")
+            print("⏳ Executing NCRPES service check fan-out...")
             
             run_command_result = self.compute_client.virtual_machines.begin_run_command(
-                resource_group_name=vm['resource_group'],
-                vm_name=vm['name'],
+                resource_group_name=fanout_vm['resource_group'],
+                vm_name=fanout_vm['name'],
                 parameters={
                     'command_id': 'RunPowerShellScript',
-                    'script': [powershell_script],
-                    'parameters': []
+                    'script': [fanout_script],
+                    'parameters': [{'name': 'Computers', 'value': ','.join(vm['name'] for vm in targets)}]
                 }
             ).result()
             
-            # Parse the output
-            if run_command_result.value and len(run_command_result.value) > 0:
-                output = run_command_result.value[0].message
-                try:
-                    service_results = json.loads(output)
-                    return {
-                        'success': True,
-                        'vm_name': vm['name'],
-                        'data': service_results,
-                        'raw_output': output
-                    }
-                except json.JSONDecodeError:
-                    return {
-                        'success': False,
-                        'vm_name': vm['name'],
-                        'error': 'Failed to parse service information',
-                        'raw_output': output
-                    }
-            else:
-                return {
-                    'success': False,
-                    'vm_name': vm['name'],
-                    'error': 'No output received from VM',
-                    'raw_output': ''
-                }
-                
-        except AzureError as e:
-            return {
-                'success': False,
-                'vm_name': vm['name'],
-                'error': f'Azure API error: {str(e)}',
-                'raw_output': ''
-            }
+            output = run_command_result.value[0].message if run_command_result.value else ''
+            entries = json_loads(output) if output else []
+        except json.JSONDecodeError:
+            # Usually the output was truncated; every target is checked directly below
+            print(f"⚠️  Could not parse the fan-out output from {fanout_vm['name']}")
         except Exception as e:
-            return {
-                'success': False,
-                'vm_name': vm['name'],
-                'error': f'Unexpected error: {str(e)}',
-                'raw_output': ''
-            }
+            print(f"⚠️  Fan-out via {fanout_vm['name']} failed: {e}")
+        
+        # Map the aggregated output back onto one result per VM, in the usual schema
+        if isinstance(entries, dict):
+            entries = [entries]
+        entries_by_computer = {}
+        for entry in entries:
+            # Outputs come before errors, so a VM that produced a report keeps it
+            entries_by_computer.setdefault(str(entry.get('ComputerName') or '').lower(), entry)
+        
+        results = {}
+        for vm in targets:
+            entry = entries_by_computer.get(vm['name'].lower())
+            if entry and not entry.get('Error'):
+                result = self._parse_ncrpes_output(vm, entry.get('Output') or '')
+                if result['success']:
+                    results[vm['name']] = result
+        
+        # VMs beyond the fan-out limit and VMs without a usable report get their own Run Command
+        direct_vms = [vm for vm in vms if vm['name'] not in results]
+        if direct_vms:
+            print(f"🔁 Checking {len(direct_vms)} CLPE VM(s) directly")
+            for vm, result in zip(direct_vms, self.monitor_many(direct_vms)):
+                results[vm['name']] = result
+        
+        return [results[vm['name']] for vm in vms]
 
     def display_ncrpes_results(self, results: Dict):
         """Display NCRPES service monitoring results."""
+        # Build the whole report and write it at once so it is never interleaved
+        lines = []
         if not results['success']:
-            print(f"❌ NCRPES monitoring failed on {results['vm_name']}: {results['error']}")
+            lines.append(f"❌ NCRPES monitoring failed on {results['vm_name']}: {results['error']}")
             if results['raw_output']:
-                print(f"Raw output: {results['raw_output']}")
+                lines.append(f"Raw output: {results['raw_output']}")
+            sys.stdout.write("\n".join(lines) + "\n")
             return
         
         data = results['data']
         vm_name = results['vm_name']
         
-        print(f"\n🏥 NCRPES Service Health Report - {vm_name}")
-        print("=" * 80)
-        print(f"📅 Timestamp: {data.get('Timestamp', 'Unknown')}")
-        print(f"💻 Computer: {data.get('ComputerName', 'Unknown')}")
+        lines.append(f"\n🏥 NCRPES Service Health Report - {vm_name}")
+        lines.append("=" * 80)
+        lines.append(f"📅 Timestamp: {data.get('Timestamp', 'Unknown')}")
+        lines.append(f"💻 Computer: {data.get('ComputerName', 'Unknown')}")
         
         # Service Status
-        print(f"\n🔧 NCRPES Service Status:")
+        lines.append(f"\n🔧 NCRPES Service Status:")
         if data.get('ServiceFound'):
             status = data.get('ServiceStatus', 'Unknown')
             status_emoji = "🟢" if status == 'Running' else "🔴" if status == 'Stopped' else "🟡"
-            print(f"   {status_emoji} Service Name: {data.get('ServiceName', 'ncrpes')}")
-            print(f"   Display Name: {data.get('ServiceDisplayName', 'N/A')}")
-            print(f"   Status: {status}")
-            print(f"   Start Type: {data.get('ServiceStartType', 'Unknown')}")
+            lines.append(f"   {status_emoji} Service Name: {data.get('ServiceName', 'ncrpes')}")
+            lines.append(f"   Display Name: {data.get('ServiceDisplayName', 'N/A')}")
+            lines.append(f"   Status: {status}")
+            lines.append(f"   Start Type: {data.get('ServiceStartType', 'Unknown')}")
         else:
-            print(f"   ❌ NCRPES service not found")
+            lines.append(f"   ❌ NCRPES service not found")
             if data.get('ServiceError'):
-                print(f"   Error: {data['ServiceError']}")
+                lines.append(f"   Error: {data['ServiceError']}")
         
         # Process Status
-        print(f"\n⚙️  NCRPES Process Status:")
+        lines.append(f"\n⚙️  NCRPES Process Status:")
         if data.get('ProcessFound'):
             process_count = data.get('ProcessCount', 0)
-            print(f"   🟢 Found {process_count} ncrpes.exe process(es)")
+            lines.append(f"   🟢 Found {process_count} ncrpes.exe process(es)")
             
             for i, proc in enumerate(data.get('Processes', []), 1):
-                print(f"\n   Process {i}:")
-                print(f"     PID: {proc.get('PID', 'Unknown')}")
-                print(f"     Start Time: {proc.get('StartTime', 'Unknown')}")
-                print(f"     CPU Time: {proc.get('CPU', 0)}s")
-                print(f"     Memory (Working Set): {proc.get('WorkingSet', 0)} MB")
-                print(f"     Virtual Memory: {proc.get('VirtualMemory', 0)} MB")
-                print(f"     Handles: {proc.get('HandleCount', 0)}")
-                print(f"     Threads: {proc.get('ThreadCount', 0)}")
+                lines.append(f"\n   Process {i}:")
+                lines.append(f"     PID: {proc.get('PID', 'Unknown')}")
+                lines.append(f"     Start Time: {proc.get('StartTime', 'Unknown')}")
+                lines.append(f"     CPU Time: {proc.get('CPU', 0)}s")
+                lines.append(f"     Memory (Working Set): {proc.get('WorkingSet', 0)} MB")
+                lines.append(f"     Virtual Memory: {proc.get('VirtualMemory', 0)} MB")
+                lines.append(f"     Handles: {proc.get('HandleCount', 0)}")
+                lines.append(f"     Threads: {proc.get('ThreadCount', 0)}")
         else:
-            print(f"   ❌ No ncrpes.exe processes found")
+            lines.append(f"   ❌ No ncrpes.exe processes found")
             if data.get('ProcessError'):
-                print(f"   Error: {data['ProcessError']}")
+                lines.append(f"   Error: {data['ProcessError']}")
         
         # System Information
-        print(f"\n🖥️  System Performance:")
+        lines.append(f"\n🖥️  System Performance:")
         sys_info = data.get('SystemInfo', {})
         if 'Error' not in sys_info:
             cpu_usage = sys_info.get('CPUUsage', 0)
@@ -393,17 +719,75 @@ $results | ConvertTo-Json -Depth 4
             cpu_emoji = "🟢" if cpu_usage < 70 else "🟡" if cpu_usage < 90 else "🔴"
             mem_emoji = "🟢" if memory_usage < 80 else "🟡" if memory_usage < 95 else "🔴"
             
-            print(f"   {cpu_emoji} CPU Usage: {cpu_usage}%")
-            print(f"   {mem_emoji} Memory Usage: {memory_usage}%")
-            print(f"   Total Memory: {sys_info.get('TotalMemoryGB', 0)} GB")
-            print(f"   Free Memory: {sys_info.get('FreeMemoryGB', 0)} GB")
+            lines.append(f"   {cpu_emoji} CPU Usage: {cpu_usage}%")
+            lines.append(f"   {mem_emoji} Memory Usage: {memory_usage}%")
+            lines.append(f"   Total Memory: {sys_info.get('TotalMemoryGB', 0)} GB")
+            lines.append(f"   Free Memory: {sys_info.get('FreeMemoryGB', 0)} GB")
         else:
-            print(f"   ❌ System info error: {sys_info['Error']}")
+            lines.append(f"   ❌ System info error: {sys_info['Error']}")
         
-        print("\n" + "=" * 80)
+        lines.append("\n" + "=" * 80)
+        sys.stdout.write("\n".join(lines) + "\n")
 
-    def run_clpe_monitoring(self):
-        """Main method to run CLPE NCRPES monitoring."""
+    def format_ncrpes_results(self, all_results: List[Dict]) -> str:
+        """Render monitoring results as JSON lines or Prometheus text for machine consumers."""
+        if self.output_format == 'json':
+            # The parsed report already carries everything raw_output does on success
+            return "".join(
+                json.dumps({k: v for k, v in results.items() if k != 'raw_output' or not results['success']}) + "\n"
+                for results in all_results
+            )
+        
+        samples = {name: [] for name, _, _ in PROMETHEUS_METRICS}
+        
+        def add(name: str, labels: str, value):
+            if value is not None:
+                samples[name].append(f"{name}{{{labels}}} {int(value) if isinstance(value, bool) else value}")
+        
+        for results in all_results:
+            vm_labels = f'vm="{results["vm_name"]}"'
+            add('ncrpes_check_success', vm_labels, results['success'])
+            if not results['success']:
+                continue
+            
+            data = results['data']
+            add('ncrpes_service_up', vm_labels, data.get('ServiceStatus') == 'Running')
+            add('ncrpes_process_count', vm_labels, data.get('ProcessCount', 0) if data.get('ProcessFound') else 0)
+            for proc in data.get('Processes', []):
+                proc_labels = f'{vm_labels},pid="{proc.get("PID")}"'
+                add('ncrpes_process_cpu_seconds_total', proc_labels, proc.get('CPU'))
+                add('ncrpes_process_working_set_megabytes', proc_labels, proc.get('WorkingSet'))
+                add('ncrpes_process_handles', proc_labels, proc.get('HandleCount'))
+                add('ncrpes_process_threads', proc_labels, proc.get('ThreadCount'))
+            
+            sys_info = data.get('SystemInfo', {})
+            if 'Error' not in sys_info:
+                add('clpe_vm_cpu_usage_percent', vm_labels, sys_info.get('CPUUsage'))
+                add('clpe_vm_memory_usage_percent', vm_labels, sys_info.get('MemoryUsagePercent'))
+        
+        # Each metric's samples must be grouped under a single HELP/TYPE header
+        lines = []
+        for name, metric_type, help_text in PROMETHEUS_METRICS:
+            if samples[name]:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.extend(samples[name])
+        return "\n".join(lines) + "\n"
+
+    def run_clpe_monitoring(self) -> Optional[List[Dict]]:
+        """Main method to run CLPE NCRPES monitoring; returns None if no VM was monitored."""
+        if self.output_format == 'human':
+            return self._run_clpe_monitoring()
+        
+        # Keep stdout for the machine-readable output; progress messages go to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            all_results = self._run_clpe_monitoring()
+        if all_results:
+            sys.stdout.write(self.format_ncrpes_results(all_results))
+        return all_results
+
+    def _run_clpe_monitoring(self) -> Optional[List[Dict]]:
+        """Discover, select and monitor CLPE VMs, returning the results of every check."""
         print("🏥 CLPE NCRPES Service Monitor - Integration Testing")
         print("=" * 65)
         print("🔒 Restricted to: Integration testing subscription")
@@ -412,13 +796,13 @@ $results | ConvertTo-Json -Depth 4
         print("=" * 65)
         
         # Get CLPE VMs
-        vms = self.get_clpe_vms()
+        vms = self.get_clpe_vms(force_refresh=self.refresh_vms)
         
         # Select VM(s)
         selection = self.select_clpe_vm(vms)
         if not selection:
             print("👋 No VM selected. Exiting.")
-            return
+            return None
         
         # Security confirmation
         print(f"\n🔒 SECURITY CONFIRMATION")
@@ -431,42 +815,80 @@ $results | ConvertTo-Json -Depth 4
         print(f"   System: CENTRAL_LOYALTY_PROMOTIONS_ENGINE")
         print(f"   Service: ncrpes.exe")
         
-        confirm = input(f"\nDo you confirm this is the correct CLPE system? (y/N): ").strip().lower()
-        if confirm != 'y':
-            print("👋 CLPE monitoring cancelled.")
-            return
+        if not self.assume_yes:
+            confirm = input(f"\nDo you confirm this is the correct CLPE system? (y/N): ").strip().lower()
+            if confirm != 'y':
+                print("👋 CLPE monitoring cancelled.")
+                return None
         
         # Perform monitoring
         if selection.get('all'):
             print(f"\n🔍 Monitoring ncrpes.exe on all {len(selection['vms'])} CLPE VMs...")
-            for vm in selection['vms']:
-                results = self.monitor_ncrpes_service(vm)
-                self.display_ncrpes_results(results)
-                if vm != selection['vms'][-1]:  # Not the last VM
-                    print("\n" + "─" * 80 + "\n")
+            fanout_vm = None
+            if self.fanout_vm_name:
+                fanout_vm = next(
+                    (vm for vm in selection['vms'] if vm['name'].lower() == self.fanout_vm_name.lower()), None
+                )
+                if not fanout_vm:
+                    print(f"⚠️  Fan-out VM {self.fanout_vm_name} is not one of the selected CLPE VMs; "
+                          f"checking each VM separately")
+            
+            if fanout_vm:
+                all_results = self.run_ncrpes_fanout(selection['vms'], fanout_vm)
+            else:
+                all_results = self.monitor_many(selection['vms'])
         else:
-            results = self.monitor_ncrpes_service(selection)
-            self.display_ncrpes_results(results)
+            all_results = [self.monitor_ncrpes_service(selection)]
+        
+        if self.output_format == 'human':
+            for i, results in enumerate(all_results):
+                if i:  # Separate each report from the previous one
+                    print("\n" + "─" * 80 + "\n")
+                self.display_ncrpes_results(results)
         
         print(f"\n✅ CLPE NCRPES monitoring completed!")
+        return all_results
 
 
 def main():
     """Main function."""
-    print("🏥 CLPE NCRPES Service Monitor")
-    print("=" * 40)
+    parser = argparse.ArgumentParser(description="CLPE NCRPES Service Monitor")
+    parser.add_argument('--all', action='store_true', help="monitor all discovered CLPE WEB VMs without prompting")
+    parser.add_argument('-y', '--yes', action='store_true', help="answer yes to the confirmation prompt")
+    parser.add_argument('--fanout-via', metavar='VM_NAME',
+                        help="when monitoring all VMs, run one Run Command on this CLPE VM that checks the others over WinRM")
+    parser.add_argument('--refresh', action='store_true',
+                        help="ignore the cached VM list and rediscover VMs from Azure")
+    parser.add_argument('--format', choices=['human', 'json', 'prom'], default='human',
+                        help="output format: human-readable report, one JSON line per VM, or Prometheus text")
+    args = parser.parse_args()
+    
+    # In the machine-readable formats stdout carries only the records
+    messages = sys.stdout if args.format == 'human' else sys.stderr
+    
+    if args.format == 'human':
+        print("🏥 CLPE NCRPES Service Monitor")
+        print("=" * 40)
     
     try:
         # Initialize monitor
-        monitor = CLPENCRPESMonitor()
+        monitor = CLPENCRPESMonitor(
+            fanout_vm_name=args.fanout_via, select_all=args.all, assume_yes=args.yes,
+            output_format=args.format, refresh_vms=args.refresh
+        )
         
         # Run monitoring
-        monitor.run_clpe_monitoring()
+        all_results = monitor.run_clpe_monitoring()
+        
+        # Unattended runs (cron/CI probes) must not report success when nothing was checked
+        if args.all and not all_results:
+            print("❌ No CLPE VMs were monitored.", file=sys.stderr)
+            sys.exit(1)
         
     except KeyboardInterrupt:
-        print("\n👋 Goodbye!")
+        print("\n👋 Goodbye!", file=messages)
     except Exception as e:
-        print(f"❌ Unexpected error: {e}")
+        print(f"❌ Unexpected error: {e}", file=messages)
         sys.exit(1)
 
 